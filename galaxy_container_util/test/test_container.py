@@ -1,24 +1,64 @@
-import json
+"""
+Unit tests for the "container" script - run with "python -m unittest" from this directory, or with
+"python -m unittest discover -s galaxy_container_util/test" from the repository root. The script and test data paths
+are resolved relative to this file
+
+Tests which download the remote image list are skipped unless the RUN_NETWORK_TESTS environment variable is set
+"""
+import dataclasses
+import operator
 import os
+import pickle
 import shutil
+import sys
 import tempfile
+import time
 import unittest
+import unittest.mock
 import zipfile
 from datetime import datetime
 from importlib.machinery import SourceFileLoader
 from importlib.util import spec_from_loader, module_from_spec
+from pathlib import Path
 
 VERBOSE = False
-TEMP_DIR = os.path.join(tempfile.gettempdir(), 'container_test')
+TEST_SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+TEST_DATA_DIR = os.path.join(TEST_SCRIPT_DIR, '..', '..', 'test_data')
+CONTAINER_SCRIPT_PATH = os.path.join(TEST_SCRIPT_DIR, '..', 'container')
+# Separate temporary directory for each pytest-xdist worker so that parallel test classes don't collide
+TEMP_DIR = os.path.join(tempfile.gettempdir(), 'container_test' + os.environ.get('PYTEST_XDIST_WORKER', ''))
 os.makedirs(TEMP_DIR, exist_ok=True)
 
-TEST_LIST_PATH = '../../test_data/test_singularity.galaxyproject.org_list.txt'
-TEST_JSON_PATH = '../../test_data/test_singularity.galaxyproject.org_images.json'
-TEST_FILTERED_JSON_PATH = '../../test_data/test_filtered_singularity.galaxyproject.org_images.json'
-TEST_DIR_ZIP_PATH = '../../test_data/test_singularity.galaxyproject.org.zip'
+TEST_LIST_PATH = os.path.join(TEST_DATA_DIR, 'test_singularity.galaxyproject.org_list.txt')
+TEST_JSON_PATH = os.path.join(TEST_DATA_DIR, 'test_singularity.galaxyproject.org_images.json')
+TEST_FILTERED_JSON_PATH = os.path.join(TEST_DATA_DIR, 'test_filtered_singularity.galaxyproject.org_images.json')
+TEST_DIR_ZIP_PATH = os.path.join(TEST_DATA_DIR, 'test_singularity.galaxyproject.org.zip')
 TEMP_IMAGE_DIR = os.path.join(TEMP_DIR, 'test_singularity.galaxyproject.org')
 TEMP_JSON_PATH = os.path.join(TEMP_DIR, 'temp_singularity.galaxyproject.org_images.json')
-TEST_RECORD = [
+TEMP_PICKLE_PATH = os.path.join(TEMP_DIR, 'temp_singularity.galaxyproject.org_images.pickle')
+TEST_CACHE_PICKLE_PATH = os.path.join(TEMP_DIR, 'test_singularity.galaxyproject.org_images.pickle')
+
+
+def _load_container_script():
+    """
+    We need to load the container script without the .py extension as a Python module - only once per process.
+    A module already loaded under the same name is only reused if it is this script, otherwise a unique name is used
+    """
+    for module_name in ("container", "galaxy_container_util_container"):
+        if (module := sys.modules.get(module_name)) is None:
+            spec = spec_from_loader(module_name, SourceFileLoader(module_name, CONTAINER_SCRIPT_PATH))
+            module = module_from_spec(spec)
+            spec.loader.exec_module(module)
+            sys.modules[module_name] = module
+            return module
+        if os.path.realpath(getattr(module, '__file__', None) or '') == os.path.realpath(CONTAINER_SCRIPT_PATH):
+            return module
+    raise ImportError(f"Unable to load {CONTAINER_SCRIPT_PATH} - module names already in use")
+
+
+container = _load_container_script()
+
+TEST_RECORD = container.Record(
     'tool_name',
     'sortable_subversion_list',
     'image_build',
@@ -28,11 +68,11 @@ TEST_RECORD = [
     'image_bytes',
     'image_datetime',
     'image_path',
-]
+)
 
 EXPECTED_SORTABLE_LIST = [
     ('samtools',
-     ['0000000001', '0000000002'],
+     [(1, ''), (2, '')],
      0,
      '',
      '1.2',
@@ -41,7 +81,7 @@ EXPECTED_SORTABLE_LIST = [
      '2023-06-23T10:08:04',
      '/cvmfs/singularity.galaxyproject.org/all/samtools:1.2'),
     ('samtools',
-     ['0000000001', '0000000002'],
+     [(1, ''), (2, '')],
      0,
      '',
      '1.2',
@@ -50,7 +90,7 @@ EXPECTED_SORTABLE_LIST = [
      '2023-06-23T10:08:04',
      '/cvmfs/singularity.galaxyproject.org/all/samtools:1.2-0'),
     ('samtools',
-     ['0000000001', '0000000002', 'rglab'],
+     [(1, ''), (2, ''), (container.STRING_SUBVERSION_RANK, 'rglab')],
      0,
      '',
      '1.2.rglab',
@@ -60,52 +100,158 @@ EXPECTED_SORTABLE_LIST = [
      '/cvmfs/singularity.galaxyproject.org/all/samtools:1.2.rglab--0')
 ]
 
-# We need to load the container script without the .py extension as a Python module
-spec = spec_from_loader("container", SourceFileLoader("container", "../container"))
-container = module_from_spec(spec)
-spec.loader.exec_module(container)
+
+# Parsed JSON fixtures keyed by path, populated once per process by _load_test_json()
+_TEST_JSON_CACHE = {}
+
+
+def _load_test_json(json_path):
+    """Load and parse a JSON fixture once, returning the shared (read-only) image info dict thereafter"""
+    if json_path not in _TEST_JSON_CACHE:
+        _TEST_JSON_CACHE[json_path] = container.load_image_info_json(Path(json_path).read_bytes())
+    return _TEST_JSON_CACHE[json_path]
+
+
+# Test image directory archive, opened once per process by _get_test_zip() and kept open until _close_test_zip()
+_TEST_ZIP = None
+
+
+def _get_test_zip():
+    """Open the test image directory archive once, returning the shared ZipFile thereafter"""
+    global _TEST_ZIP
+    if _TEST_ZIP is None:
+        _TEST_ZIP = zipfile.ZipFile(TEST_DIR_ZIP_PATH, 'r')
+    return _TEST_ZIP
+
+
+def _close_test_zip():
+    """Close the shared test image directory archive if open"""
+    global _TEST_ZIP
+    if _TEST_ZIP is not None:
+        _TEST_ZIP.close()
+        _TEST_ZIP = None
 
 
-class FakeArgs(object):
+@dataclasses.dataclass(frozen=True)
+class FakeArgs:
     """Fake arguments"""
+    quiet: bool = True
+    refresh: bool = False
+    version: str = None
+    latest: bool = False
+    all: bool = False
+    modified: bool = False
+    size: bool = False
 
-    def __init__(self):
-        self.quiet = True
-        self.refresh = False
-        self.version = None
-        self.latest = False
-        self.all = False
-        self.modified = False
-        self.size = False
+
+# Default arguments for tests - use dataclasses.replace() to vary
+_BASE_ARGS = FakeArgs(quiet=not VERBOSE)
 
 
 class ContainerTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Stat each fixture file once up front to warm the dentry/page caches for the tests which read them
+        for fixture_path in (TEST_LIST_PATH, TEST_JSON_PATH, TEST_FILTERED_JSON_PATH):
+            os.stat(fixture_path)
+
+        _load_test_json(TEST_JSON_PATH)
+        _load_test_json(TEST_FILTERED_JSON_PATH)
+
+        # Produce binary cache fixture from JSON
+        with open(TEST_CACHE_PICKLE_PATH, 'wb') as pickle_file:
+            pickle.dump(_load_test_json(TEST_JSON_PATH), pickle_file, protocol=4)
+
+        # Extract test image directory once for all directory listing tests - none of them modify it
+        if os.name != 'posix':
+            return
+        cls.refresh_test_dir(_get_test_zip(), TEMP_IMAGE_DIR)
+
+    @classmethod
+    def tearDownClass(cls):
+        # Test image directory is deliberately kept so that refresh_test_dir() only needs to check it next run
+        _close_test_zip()
+
     @staticmethod
-    def compare_image_info_dicts_without_dates(image_info_dict1, image_info_dict2):
+    def flatten_image_info_dict_without_dates(image_info_dict):
+        """Flatten nested image info dict to {(tool_name, version, variant): (image_filename, image_bytes)}"""
+        without_date = operator.itemgetter(container.VariantFieldIndex.image_filename,
+                                           container.VariantFieldIndex.image_bytes)
+        return {(tool_name, version, variant): without_date(variant_values)
+                for tool_name, tool_values in image_info_dict.items()
+                for version, version_values in tool_values.items()
+                for variant, variant_values in version_values.items()}
+
+    @classmethod
+    def compare_image_info_dicts_without_dates(cls, image_info_dict1, image_info_dict2):
         """Need to ignore date modified for comparisons when listing real files because dates may change"""
-        for tool_name, tool_values1 in image_info_dict1.items():
-            if not (tool_values2 := image_info_dict2.get(tool_name)):
-                return False
-            for version, version_values1 in tool_values1.items():
-                if not (version_values2 := tool_values2.get(version)):
-                    return False
-                for variant, variant_values1 in version_values1.items():
-                    if not (variant_values2 := version_values2.get(variant)):
-                        return False
-                    if variant_values1[:2] != variant_values2[:2]:  # Don't look at third element (image_datetime)
-                        return False
-        return True
+        return (cls.flatten_image_info_dict_without_dates(image_info_dict1)
+                == cls.flatten_image_info_dict_without_dates(image_info_dict2))
 
     @staticmethod
-    def refresh_test_dir(zip_path, test_dir_path):
+    def refresh_test_dir(zipped_test_dir, test_dir_path):
+        """
+        Bring (flat) test_dir_path into line with open ZipFile zipped_test_dir, only extracting members which are
+        missing or differ from the existing files, and removing any files not in the archive
+        """
+        extract_dir = os.path.dirname(test_dir_path)
+        existing_entries = {}
         if os.path.isdir(test_dir_path):
-            shutil.rmtree(test_dir_path)
-        zipped_test_dir = zipfile.ZipFile(zip_path)
-        zipped_test_dir.extractall(path=os.path.dirname(test_dir_path))
+            with os.scandir(test_dir_path) as dir_entries:
+                existing_entries = {os.path.normpath(entry.path): entry for entry in dir_entries}
+
+        member_paths = set()
+        for info in zipped_test_dir.infolist():
+            target_path = os.path.normpath(os.path.join(extract_dir, info.filename))
+            member_paths.add(target_path)
+            if info.is_dir():
+                os.makedirs(target_path, exist_ok=True)
+                continue
+
+            # Extracted files are stamped with the archived modification time, so any other time means a change
+            member_mtime = time.mktime(info.date_time + (0, 0, -1))
+            if (entry := existing_entries.get(target_path)) and entry.is_file(follow_symlinks=False):
+                file_stat = entry.stat(follow_symlinks=False)
+                if file_stat.st_size == info.file_size and file_stat.st_mtime == member_mtime:
+                    continue
+            zipped_test_dir.extract(info, path=extract_dir)
+            os.utime(target_path, (member_mtime, member_mtime))
+
+        for stale_path in existing_entries.keys() - member_paths:
+            if existing_entries[stale_path].is_dir(follow_symlinks=False):
+                shutil.rmtree(stale_path)
+            else:
+                os.remove(stale_path)
+
+    def test_refresh_test_dir(self):
+        if os.name != 'posix':
+            print("Skipping directory refresh test in non-posix OS")
+            return
+
+        # Use separate directory so as not to disturb the shared one
+        test_dir_path = os.path.join(TEMP_DIR, 'refresh_test', os.path.basename(TEMP_IMAGE_DIR))
+        self.refresh_test_dir(_get_test_zip(), test_dir_path)
+        file_names = sorted(os.listdir(test_dir_path))
+        changed_path, deleted_path = [os.path.join(test_dir_path, file_name) for file_name in file_names[:2]]
+        with open(changed_path, 'rb') as image_file:
+            original_content = image_file.read()
+
+        with open(changed_path, 'wb') as image_file:  # Same size, different content
+            image_file.write(b'x' * len(original_content))
+        os.remove(deleted_path)
+        with open(os.path.join(test_dir_path, 'stray_file'), 'w') as stray_file:
+            stray_file.write('stray')
+
+        self.refresh_test_dir(_get_test_zip(), test_dir_path)
+
+        self.assertEqual(sorted(os.listdir(test_dir_path)), file_names)
+        with open(changed_path, 'rb') as image_file:
+            self.assertEqual(image_file.read(), original_content)
+
+        shutil.rmtree(os.path.dirname(test_dir_path))
 
     def test_load_image_info_json(self):
-        with open(TEST_JSON_PATH) as json_file:
-            test_json_object = container.load_image_info_json(json_file.read())
+        test_json_object = _load_test_json(TEST_JSON_PATH)
 
         for image_values in test_json_object.values():
             for version_values in image_values.values():
@@ -117,55 +263,129 @@ class ContainerTestCase(unittest.TestCase):
                     self.assertEqual(type(variant_values[2]), str)
 
     def test_parse_image_info(self):
-        with open(TEST_LIST_PATH) as line_source:
+        with open(TEST_LIST_PATH, 'rb') as line_source:
             image_info_dict = container.parse_image_info(line_source)
 
         # with open(TEST_JSON_PATH, 'w') as json_file:
         #     json_file.write(json.dumps(image_info_dict, indent=2))
 
-        with open(TEST_JSON_PATH, 'r') as json_file:
-            test_json_object = container.load_image_info_json(json_file.read())
+        test_json_object = _load_test_json(TEST_JSON_PATH)
 
         self.maxDiff = None
         self.assertEqual(image_info_dict, test_json_object)
 
+    def test_parse_image_info_from_text(self):
+        with open(TEST_LIST_PATH) as line_source:
+            image_info_dict = container.parse_image_info(line_source)
+
+        self.maxDiff = None
+        self.assertEqual(image_info_dict, _load_test_json(TEST_JSON_PATH))
+
+    def test_get_image_info_from_unchanged_list(self):
+        list_url = Path(TEST_LIST_PATH).resolve().as_uri()
+        for path in (TEMP_PICKLE_PATH, TEMP_PICKLE_PATH + container.LIST_DIGEST_SUFFIX):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+        image_info_dict = container.get_image_info(cache_path=TEMP_PICKLE_PATH,
+                                                   image_dir='dummy_dir',
+                                                   list_url=list_url,
+                                                   min_cache_datetime=datetime.now(),  # Always expire cache
+                                                   args=_BASE_ARGS)
+        self.maxDiff = None
+        self.assertEqual(image_info_dict, _load_test_json(TEST_JSON_PATH))
+
+        # Expired cache is reused without parsing when list is unchanged
+        with unittest.mock.patch.object(container, 'parse_image_info', side_effect=AssertionError) as parse_mock:
+            image_info_dict = container.get_image_info(cache_path=TEMP_PICKLE_PATH,
+                                                       image_dir='dummy_dir',
+                                                       list_url=list_url,
+                                                       min_cache_datetime=datetime.now(),  # Always expire cache
+                                                       args=_BASE_ARGS,
+                                                       tool_search_strings=['samtools'])
+        parse_mock.assert_not_called()
+        self.assertEqual(image_info_dict, _load_test_json(TEST_FILTERED_JSON_PATH))
+
+        # List is parsed again when it no longer matches the digest of the cache
+        container.save_list_digest(TEMP_PICKLE_PATH, 'changed')
+        with unittest.mock.patch.object(container, 'parse_image_info',
+                                        wraps=container.parse_image_info) as parse_mock:
+            container.get_image_info(cache_path=TEMP_PICKLE_PATH,
+                                     image_dir='dummy_dir',
+                                     list_url=list_url,
+                                     min_cache_datetime=datetime.now(),  # Always expire cache
+                                     args=_BASE_ARGS)
+        parse_mock.assert_called_once()
+
     def test_get_image_info_from_cache(self):
-        args = FakeArgs()
-        args.quiet = not VERBOSE
-        args.refresh = False
+        args = _BASE_ARGS
 
-        image_info_dict = container.get_image_info(cache_json_path=TEST_JSON_PATH,
+        image_info_dict = container.get_image_info(cache_path=TEST_JSON_PATH,
                                                    image_dir='blah',
                                                    list_url='blah',
                                                    min_cache_datetime=datetime(2000, 1, 1, 0, 0, 0, 0),  # Never expire
                                                    args=args)
 
-        with open(TEST_JSON_PATH) as json_file:
-            test_json_object = container.load_image_info_json(json_file.read())
+        test_json_object = _load_test_json(TEST_JSON_PATH)
 
         self.maxDiff = None
         self.assertEqual(image_info_dict, test_json_object)
 
-    def test_get_image_info_from_dir_expired_cache(self):
+    def test_get_image_info_from_pickle_cache(self):
+        args = _BASE_ARGS
+
+        image_info_dict = container.get_image_info(cache_path=TEST_CACHE_PICKLE_PATH,
+                                                   image_dir='blah',
+                                                   list_url='blah',
+                                                   min_cache_datetime=datetime(2000, 1, 1, 0, 0, 0, 0),  # Never expire
+                                                   args=args)
+
+        self.maxDiff = None
+        self.assertEqual(image_info_dict, _load_test_json(TEST_JSON_PATH))
+
+    def test_load_image_info_cache_rejects_globals(self):
+        with open(TEMP_PICKLE_PATH, 'wb') as pickle_file:
+            pickle.dump({'tool': {'1.0': {'': (datetime(2000, 1, 1), 5, '')}}}, pickle_file)
+
+        with self.assertRaises(pickle.UnpicklingError):
+            container.load_image_info_cache(TEMP_PICKLE_PATH)
+
+    def test_get_image_info_from_dir_corrupt_cache(self):
 
         if os.name != 'posix':
             print("Skipping directory listing test in non-posix OS")
             return
 
-        self.refresh_test_dir(TEST_DIR_ZIP_PATH, TEMP_IMAGE_DIR)
+        with open(TEMP_PICKLE_PATH, 'wb') as pickle_file:  # Truncated cache
+            pickle_file.write(pickle.dumps(_load_test_json(TEST_JSON_PATH), protocol=4)[:100])
+
+        image_info_dict = container.get_image_info(cache_path=TEMP_PICKLE_PATH,
+                                                   image_dir=TEMP_IMAGE_DIR,
+                                                   list_url='blah',
+                                                   min_cache_datetime=datetime(2000, 1, 1, 0, 0, 0, 0),  # Never expire
+                                                   args=_BASE_ARGS)
+
+        self.assertTrue(self.compare_image_info_dicts_without_dates(image_info_dict, _load_test_json(TEST_JSON_PATH)))
+        # Cache rebuilt
+        self.assertEqual(container.load_image_info_cache(TEMP_PICKLE_PATH), image_info_dict)
+
+    def test_get_image_info_from_dir_expired_cache(self):
+
+        if os.name != 'posix':
+            print("Skipping directory listing test in non-posix OS")
+            return
 
-        args = FakeArgs()
-        args.quiet = not VERBOSE
-        args.refresh = False
+        args = _BASE_ARGS
 
-        image_info_dict = container.get_image_info(cache_json_path=TEMP_JSON_PATH,
+        image_info_dict = container.get_image_info(cache_path=TEMP_JSON_PATH,
                                                    image_dir=TEMP_IMAGE_DIR,
                                                    list_url='blah',
                                                    min_cache_datetime=datetime.now(),  # Always expire cache
                                                    args=args)
 
-        with open(TEST_JSON_PATH) as json_file:
-            test_json_object = container.load_image_info_json(json_file.read())
+        test_json_object = _load_test_json(TEST_JSON_PATH)
 
         self.assertTrue(self.compare_image_info_dicts_without_dates(image_info_dict, test_json_object))
 
@@ -175,35 +395,45 @@ class ContainerTestCase(unittest.TestCase):
             print("Skipping directory listing test in non-posix OS")
             return
 
-        self.refresh_test_dir(TEST_DIR_ZIP_PATH, TEMP_IMAGE_DIR)
+        args = dataclasses.replace(_BASE_ARGS, refresh=True)
 
-        args = FakeArgs()
-        args.quiet = not VERBOSE
-        args.refresh = True
-
-        image_info_dict = container.get_image_info(cache_json_path=TEMP_JSON_PATH,
+        image_info_dict = container.get_image_info(cache_path=TEMP_JSON_PATH,
                                                    image_dir=TEMP_IMAGE_DIR,
                                                    list_url=container.IMAGE_LIST_URL,
                                                    min_cache_datetime=datetime(2000, 1, 1, 0, 0, 0, 0),  # Never expire
                                                    args=args)
 
-        with open(TEST_JSON_PATH) as json_file:
-            test_json_object = container.load_image_info_json(json_file.read())
+        test_json_object = _load_test_json(TEST_JSON_PATH)
 
         self.assertTrue(self.compare_image_info_dicts_without_dates(image_info_dict, test_json_object))
 
+    def test_get_image_info_from_dir_filtered(self):
+
+        if os.name != 'posix':
+            print("Skipping directory listing test in non-posix OS")
+            return
+
+        image_info_dict = container.get_image_info(cache_path=TEMP_JSON_PATH,
+                                                   image_dir=TEMP_IMAGE_DIR,
+                                                   list_url='blah',
+                                                   min_cache_datetime=datetime.now(),  # Always expire cache
+                                                   args=_BASE_ARGS,
+                                                   tool_search_strings=['samtools'])
+
+        self.assertTrue(self.compare_image_info_dicts_without_dates(image_info_dict,
+                                                                    _load_test_json(TEST_FILTERED_JSON_PATH)))
+
+    @unittest.skipUnless(os.environ.get('RUN_NETWORK_TESTS'), 'network test - set RUN_NETWORK_TESTS=1 to run')
     def test_get_image_info_from_url_expired_cache(self):
         """This is a bit of a rubbish test which checks the URL"""
-        args = FakeArgs()
-        args.quiet = not VERBOSE
-        args.refresh = False
+        args = _BASE_ARGS
 
         try:
             os.remove(TEMP_JSON_PATH, )
         except FileNotFoundError:
             pass
 
-        image_info_dict = container.get_image_info(cache_json_path=TEMP_JSON_PATH,
+        image_info_dict = container.get_image_info(cache_path=TEMP_JSON_PATH,
                                                    image_dir='dummy_dir',
                                                    list_url=container.IMAGE_LIST_URL,
                                                    min_cache_datetime=datetime.now(),  # Always expire cache
@@ -212,52 +442,73 @@ class ContainerTestCase(unittest.TestCase):
         self.assertTrue(len(image_info_dict) > 10000)
 
     def test_get_sort_function_default_sort(self):
-        args = FakeArgs()
-        args.quiet = not VERBOSE
-        args.modified = False
-        args.size = False
+        args = _BASE_ARGS
         sort_function = container.get_sort_function(args)
         self.assertEqual(sort_function(TEST_RECORD), ('tool_name', 'sortable_subversion_list', 'image_build'))
 
     def test_get_sort_function_modified_sort(self):
-        args = FakeArgs()
-        args.quiet = not VERBOSE
-        args.modified = True
-        args.size = False
+        args = dataclasses.replace(_BASE_ARGS, modified=True)
         sort_function = container.get_sort_function(args)
         self.assertEqual(sort_function(TEST_RECORD), ('tool_name', 'image_datetime'))
 
     def test_get_sort_function_size_sort(self):
-        args = FakeArgs()
-        args.quiet = not VERBOSE
-        args.modified = False
-        args.size = True
+        args = dataclasses.replace(_BASE_ARGS, size=True)
         sort_function = container.get_sort_function(args)
         self.assertEqual(sort_function(TEST_RECORD), ('tool_name', 'image_bytes'))
 
+    def test_make_sortable_subversion_list(self):
+        version_strings = ['1.10', '1.2.rglab', '1.2', '1.2.3', '1.9']
+        self.assertEqual(sorted(version_strings, key=container.make_sortable_subversion_list),
+                         ['1.2', '1.2.3', '1.2.rglab', '1.9', '1.10'])
+
+    def test_sort_records_by_size_and_modified(self):
+        records = [container.Record('tool_b', [], 0, '', '1', '', 3, '2023-01-02T00:00:00', 'b1'),
+                   container.Record('tool_a', [], 0, '', '1', '', 9, '2023-01-01T00:00:00', 'a1'),
+                   container.Record('tool_b', [], 0, '', '2', '', 1, '2023-01-03T00:00:00', 'b2'),
+                   container.Record('tool_a', [], 0, '', '2', '', 9, '2022-12-31T00:00:00', 'a2'),
+                   container.Record('tool_b', [], 0, '', '3', '', 3, '2023-01-01T00:00:00', 'b3')]
+
+        for args in [dataclasses.replace(_BASE_ARGS, size=True), dataclasses.replace(_BASE_ARGS, modified=True)]:
+            sort_function = container.get_sort_function(args)
+            # Force NumPy sort (if installed) for small list - must match stable Python sort
+            with unittest.mock.patch.object(container, 'NUMPY_SORT_MIN_RECORDS', 0):
+                self.assertEqual(container.sort_records(records, sort_function, args),
+                                 sorted(records, key=sort_function))
+
     def test_filter_image_info(self):
-        with open(TEST_JSON_PATH) as json_file:
-            image_info_dict = container.load_image_info_json(json_file.read())
+        image_info_dict = _load_test_json(TEST_JSON_PATH)
 
         tool_search_strings = ['samtools']
 
         filtered_image_info = container.filter_image_info(image_info_dict, tool_search_strings)
 
-        with open(TEST_FILTERED_JSON_PATH) as json_file:
-            test_json_object = container.load_image_info_json(json_file.read())
+        test_json_object = _load_test_json(TEST_FILTERED_JSON_PATH)
 
         self.maxDiff = None
         self.assertEqual(filtered_image_info, test_json_object)
 
+    def test_load_filtered_image_info_json(self):
+        with open(TEST_JSON_PATH, 'rb') as json_file:
+            filtered_image_info = container.load_filtered_image_info_json(json_file, ['samtools'])
+
+        self.maxDiff = None
+        self.assertEqual(filtered_image_info, _load_test_json(TEST_FILTERED_JSON_PATH))
+
+    def test_get_image_info_from_cache_filtered(self):
+        image_info_dict = container.get_image_info(cache_path=TEST_JSON_PATH,
+                                                   image_dir='blah',
+                                                   list_url='blah',
+                                                   min_cache_datetime=datetime(2000, 1, 1, 0, 0, 0, 0),  # Never expire
+                                                   args=_BASE_ARGS,
+                                                   tool_search_strings=['samtools'])
+
+        self.maxDiff = None
+        self.assertEqual(image_info_dict, _load_test_json(TEST_FILTERED_JSON_PATH))
+
     def test_make_sortable_list_by_version(self):
-        args = FakeArgs()
-        args.quiet = not VERBOSE
-        args.modified = False
-        args.size = False
-        args.version = '1.2'
-
-        with open(TEST_FILTERED_JSON_PATH) as json_file:
-            result_info_dict = container.load_image_info_json(json_file.read())
+        args = dataclasses.replace(_BASE_ARGS, version='1.2')
+
+        result_info_dict = _load_test_json(TEST_FILTERED_JSON_PATH)
 
         sort_function = container.get_sort_function(args)
 